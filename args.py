@@ -47,3 +47,14 @@ def get_factory_config_path() -> Optional[str]:
     if _args is None:
         return None
     return getattr(_args, 'factory_config', None)
+
+def get_backend() -> str:
+    """
+    Get the solver backend from command line arguments.
+    
+    Returns:
+        The backend name, 'pyomo' if not set
+    """
+    if _args is None:
+        return 'pyomo'
+    return getattr(_args, 'backend', 'pyomo')
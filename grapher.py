@@ -1,16 +1,16 @@
 import abc
 from collections import defaultdict
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from functools import reduce
 import itertools
 import math
-import re
+import operator
 import graphviz # type: ignore
-import pyomo.environ as pyomo # type: ignore
 
 import args
 from gamelogic.machines import MachineRecipe
-from models import Item, make_item
+from models import ZERO_TOLERANCE, Item, VarMeta, make_item
 
 EDGE_COLOR_ITERATOR = itertools.cycle([
     '#b58900', # 'yellow'
@@ -30,12 +30,14 @@ class ItemRate:
 
 class Node:
     __metaclass__ = abc.ABCMeta
+    __slots__ = ('id',)
     id: str
 
     def __init__(self, id: str):
         self.id = id
 
 class SourceNode(Node):
+    __slots__ = ('item', 'quantity')
     item: str
     quantity: float
 
@@ -45,6 +47,7 @@ class SourceNode(Node):
         super().__init__(id)
 
 class SinkNode(Node):
+    __slots__ = ('item', 'quantity')
     item: str
     quantity: float
 
@@ -54,6 +57,7 @@ class SinkNode(Node):
         super().__init__(id)
 
 class MachineNode(Node):
+    __slots__ = ('machine_name', 'quantity', 'recipe')
     machine_name: str
     quantity: float
     recipe: MachineRecipe
@@ -65,6 +69,7 @@ class MachineNode(Node):
         super().__init__(id)
 
 class MachineInputNode(Node):
+    __slots__ = ('machine_id', 'item', 'quantity')
     machine_id: str
     item: str
     quantity: float
@@ -76,6 +81,7 @@ class MachineInputNode(Node):
         super().__init__(id)
 
 class MachineOutputNode(Node):
+    __slots__ = ('machine_id', 'item', 'quantity')
     machine_id: str
     item: str
     quantity: float
@@ -87,6 +93,7 @@ class MachineOutputNode(Node):
         super().__init__(id)
     
 class ItemNode(Node):
+    __slots__ = ('item', 'quantity')
     item: str
     quantity: float
 
@@ -95,22 +102,28 @@ class ItemNode(Node):
         self.quantity = quantity
         super().__init__(id)
 
-@dataclass
+# Node types which an item edge may end at
+ITEM_EDGE_END_TYPES = (SourceNode, SinkNode, ItemNode, MachineInputNode)
+
+def is_zero(quantity: float | None) -> bool:
+    return quantity is None or abs(quantity) <= ZERO_TOLERANCE
+
+@dataclass(slots=True)
 class DirectedEdge:
     start: Node
     end: Node
 
-@dataclass
+@dataclass(slots=True)
 class ItemDirectedEdge(DirectedEdge):
     item: Item
     quantity: float
 
-@dataclass
+@dataclass(slots=True)
 class MachineInputDirectedEdge(DirectedEdge):
     '''Edge subclass to differentiate machine input edges'''
     machine_id: str
 
-@dataclass
+@dataclass(slots=True)
 class MachineOutputDirectedEdge(DirectedEdge):
     '''Edge subclass to differentiate machine output edges'''
     machine_id: str
@@ -120,235 +133,146 @@ class SolutionGraph:
     nodes: list[Node] = field(default_factory=list)
     edges: list[DirectedEdge] = field(default_factory=list)
 
-def build_solution_graph(model: pyomo.Model, machine_id_to_recipe_map: dict[str, MachineRecipe]) -> SolutionGraph:
+def build_solution_graph(variables: dict[str, float], var_meta: dict[str, VarMeta], machine_id_to_recipe_map: dict[str, MachineRecipe]) -> SolutionGraph:
     graph = SolutionGraph()
 
-    # Extract variable names and values
-    variables = {v.name.strip("'"): v.value for v in model.component_objects(pyomo.Var, active=True) for v in v.values()}
-    
-    # Define regex patterns
-    machine_pattern = re.compile(r'^(M\d+)$')
-    machine_input_pattern = re.compile(r'^(M\d+)_IN_((?:(?!TO_).)+)$')
-    machine_output_pattern = re.compile(r'^(M\d+)_OUT_((?:(?!TO_).)+)$')
-    sink_pattern = re.compile(r'^SINK_((?:(?!IN_).)+)$')
-    sink_in_pattern = re.compile(r'^SINK_IN_.*$')
-    source_pattern = re.compile(r'^SOURCE_(?:(?!OUT_))((?:(?!TO_).)+)$')
-    source_out_pattern = re.compile(r'^SOURCE_OUT_(?:(?!TO_).)+$')
-    link_pattern = re.compile(r'^(.*)_TO_(.*)$')
-    
-    # Filter variables by patterns
-    machines = {k: v for k, v in variables.items() if machine_pattern.match(k)}
-    sources = {k: v for k, v in variables.items() if source_pattern.match(k)}
-    source_outs = {k: v for k, v in variables.items() if source_out_pattern.match(k)}
-    sinks = {k: v for k, v in variables.items() if sink_pattern.match(k)}
-    sink_ins = {k: v for k, v in variables.items() if sink_in_pattern.match(k)}
-    links = [{"start": s, "end": e, "value": v} for k, v in variables.items() if (match := link_pattern.match(k)) for s, e in [match.groups()]]
-
-    # Associate machines and their inputs
-    machine_inputs: list[tuple[str, str, float]] = []
-    for k, v in variables.items():
-        match = machine_input_pattern.match(k)
-        if match:
-            machine, *_ = match.groups()
-            machine_inputs.append((machine, k, v))
-    
-    # Associate machines and their outputs
-    machine_outputs: list[tuple[str, str, float]] = []
-    for k, v in variables.items():
-        match = machine_output_pattern.match(k)
-        if match:
-            machine, *_ = match.groups()
-            machine_outputs.append((machine, k, v))
-
-    # Print filtered variables if verbose mode is enabled
-    if args.is_verbose():
-        print("\nMachines:")
-        for k, v in machines.items():
-            print(f"{k} = {v}")
-
-        print("\nMachine inputs:")
-        for m, k, v in machine_inputs:
-            print(f"{m}: {k} = {v}")
-        
-        print("\nMachine outputs:")
-        for m, k, v in machine_outputs:
-            print(f"{m}: {k} = {v}")
-        
-        print("\nSources:")
-        for k, v in sources.items():
-            print(f"{k} = {v}")
-        
-        print("\nSource OUTs:")
-        for k, v in source_outs.items():
-            print(f"{k} = {v}")
-
-        print("\nSinks:")
-        for k, v in sinks.items():
-            print(f"{k} = {v}")
-        
-        print("\nSink INs:")
-        for k, v in sink_ins.items():
-            print(f"{k} = {v}")
-        
-        print("\nLinks:")
-        for link in links:
-            print(link)
-
-    # Map to relate the string name of a link within a link to its corresponding node.
-    link_name_to_node_map: dict[str, Node] = {}
-
-    # Make source nodes
+    # Build nodes straight from the variables in a single pass, dispatching on what each one stands for
     source_nodes: dict[str, SourceNode] = {}
-    for source, quantity in sources.items():
-        if math.isclose(quantity, 0.0):
-            continue
-
-        match = source_pattern.match(source)
-        if match:
-            source_name, = match.groups()
-            source_node = SourceNode(id = source, item = source_name, quantity = quantity)
-            source_nodes[source_name] = source_node
-            link_name_to_node_map[source] = source_node
-            graph.nodes.append(source_node)
-
-    # Make source OUT nodes
-    for source_out, quantity in source_outs.items():
-        if math.isclose(quantity, 0.0):
-            continue
-
-        item_name = str.replace(source_out, 'SOURCE_OUT_', '')
-        source_out_node = ItemNode(id = source_out, item = item_name, quantity = quantity)
-        link_name_to_node_map[source_out] = source_out_node
-        graph.nodes.append(source_out_node)
-
-        # Create edge between source node and source OUT node
-        source = str.replace(source_out, '_OUT', '')
-        graph.edges.append(ItemDirectedEdge(
-            start = link_name_to_node_map[source],
-            end = link_name_to_node_map[source_out],
-            item = make_item(item_name),
-            quantity = quantity,
-        ))
-
-    # Make sink nodes
+    source_out_nodes: dict[str, ItemNode] = {}
     sink_nodes: dict[str, SinkNode] = {}
-    for sink, quantity in sinks.items():
-        if math.isclose(quantity, 0.0):
-            continue
-
-        match = sink_pattern.match(sink)
-        if match:
-            sink_name, = match.groups()
-            sink_node = SinkNode(id = sink, item = sink_name, quantity = quantity)
-            sink_nodes[sink_name] = sink_node
-            link_name_to_node_map[sink] = sink_node
-            graph.nodes.append(sink_node)
-
-    # Make sink IN nodes
-    for sink_in, quantity in sink_ins.items():
-        if math.isclose(quantity, 0.0):
-            continue
-
-        item_name = str.replace(sink_in, 'SINK_IN_', '')
-        sink_in_node = ItemNode(id = sink_in, item = item_name, quantity = quantity)
-        link_name_to_node_map[sink_in] = sink_in_node
-        graph.nodes.append(sink_in_node)
-
-        # Create edge between sink IN node and sink node
-        sink = str.replace(sink_in, '_IN', '')
-        graph.edges.append(ItemDirectedEdge(
-            start = link_name_to_node_map[sink_in],
-            end = link_name_to_node_map[sink],
-            item = make_item(item_name),
-            quantity = quantity,
-        ))
-    
-    # Make machine nodes
+    sink_in_nodes: dict[str, ItemNode] = {}
     machine_nodes: dict[str, MachineNode] = {}
-    for machine, quantity in machines.items():
-        match = machine_pattern.match(machine)
-        if match:
-            machine_id, = match.groups()
-            recipe = machine_id_to_recipe_map[machine_id]
-            machine_name = recipe.machine_name
-            machine_node = MachineNode(
-                id = machine,
-                machine_name = machine_name,
-                quantity = quantity,
-                recipe = recipe,
-            )
-            machine_nodes[machine_id] = machine_node
-            link_name_to_node_map[machine] = machine_node
-            graph.nodes.append(machine_node)
+    machine_input_nodes: dict[str, MachineInputNode] = {}
+    machine_output_nodes: dict[str, MachineOutputNode] = {}
+    links: list[tuple[str, str, float]] = []
+    for k, quantity in variables.items():
+        meta = var_meta[k]
+        match meta.kind:
+            case 'machine':
+                recipe = machine_id_to_recipe_map[k]
+                machine_nodes[k] = MachineNode(
+                    id = k,
+                    machine_name = recipe.machine_name,
+                    quantity = quantity,
+                    recipe = recipe,
+                )
+            case _ if is_zero(quantity):
+                continue
+            case 'tax':
+                # Taxes are objective penalties, not item sources
+                continue
+            case 'link':
+                out_link, in_link = meta.endpoints
+                links.append((out_link, in_link, quantity))
+            case 'in':
+                machine_input_nodes[k] = MachineInputNode(id = k, machine_id = meta.machine, item = meta.item, quantity = quantity)
+            case 'out':
+                machine_output_nodes[k] = MachineOutputNode(id = k, machine_id = meta.machine, item = meta.item, quantity = quantity)
+            case 'source_out':
+                source_out_nodes[k] = ItemNode(id = k, item = meta.item, quantity = quantity)
+            case 'source':
+                source_nodes[k] = SourceNode(id = k, item = meta.item, quantity = quantity)
+            case 'sink_in':
+                sink_in_nodes[k] = ItemNode(id = k, item = meta.item, quantity = quantity)
+            case 'sink':
+                sink_nodes[k] = SinkNode(id = k, item = meta.item, quantity = quantity)
+
+    # Print the nodes and links making up the graph if verbose mode is enabled
+    if args.is_verbose():
+        print('\n'.join([
+            "\nMachines:",
+            *(f"{machine_node.id} = {machine_node.quantity}" for machine_node in machine_nodes.values()),
+            "\nMachine inputs:",
+            *(f"{input_node.machine_id}: {input_node.id} = {input_node.quantity}" for input_node in machine_input_nodes.values()),
+            "\nMachine outputs:",
+            *(f"{output_node.machine_id}: {output_node.id} = {output_node.quantity}" for output_node in machine_output_nodes.values()),
+            "\nSources:",
+            *(f"{source_node.id} = {source_node.quantity}" for source_node in source_nodes.values()),
+            "\nSource OUTs:",
+            *(f"{source_out_node.id} = {source_out_node.quantity}" for source_out_node in source_out_nodes.values()),
+            "\nSinks:",
+            *(f"{sink_node.id} = {sink_node.quantity}" for sink_node in sink_nodes.values()),
+            "\nSink INs:",
+            *(f"{sink_in_node.id} = {sink_in_node.quantity}" for sink_in_node in sink_in_nodes.values()),
+            "\nLinks:",
+            *(f"{out_link} -> {in_link} = {quantity}" for out_link, in_link, quantity in links),
+        ]))
+
+    graph.nodes.extend(source_nodes.values())
+    graph.nodes.extend(source_out_nodes.values())
+    graph.nodes.extend(sink_nodes.values())
+    graph.nodes.extend(sink_in_nodes.values())
+    graph.nodes.extend(machine_nodes.values())
+    graph.nodes.extend(machine_input_nodes.values())
+    graph.nodes.extend(machine_output_nodes.values())
+
+    # Now that every node exists, connect each port node to its owner
+    graph.edges.extend(
+        ItemDirectedEdge(
+            start = source_nodes['SOURCE_' + source_out_node.item],
+            end = source_out_node,
+            item = make_item(source_out_node.item),
+            quantity = source_out_node.quantity,
+        )
+        for source_out_node in source_out_nodes.values()
+    )
 
-    # Make machine IN nodes
-    for machine, input_node_name, quantity in machine_inputs:
-        if math.isclose(quantity, 0.0):
-            continue
+    graph.edges.extend(
+        ItemDirectedEdge(
+            start = sink_in_node,
+            end = sink_nodes['SINK_' + sink_in_node.item],
+            item = make_item(sink_in_node.item),
+            quantity = sink_in_node.quantity,
+        )
+        for sink_in_node in sink_in_nodes.values()
+    )
 
-        match = machine_input_pattern.match(input_node_name)
-        if match:
-            _, item_name = match.groups()
-            input_node = MachineInputNode(id = input_node_name, machine_id = machine, item = item_name, quantity = quantity)
-            link_name_to_node_map[input_node_name] = input_node
-            graph.nodes.append(input_node)
-
-            # Create edge between machine and machine input node
-            graph.edges.append(MachineInputDirectedEdge(
-                start = link_name_to_node_map[input_node_name],
-                end = link_name_to_node_map[machine],
-                machine_id = machine,
-            ))
+    graph.edges.extend(
+        MachineInputDirectedEdge(
+            start = input_node,
+            end = machine_nodes[input_node.machine_id],
+            machine_id = input_node.machine_id,
+        )
+        for input_node in machine_input_nodes.values()
+    )
 
-    # Make machine OUT nodes
-    for machine, output_node_name, quantity in machine_outputs:
-        if math.isclose(quantity, 0.0):
-            continue
+    graph.edges.extend(
+        MachineOutputDirectedEdge(
+            start = machine_nodes[output_node.machine_id],
+            end = output_node,
+            machine_id = output_node.machine_id,
+        )
+        for output_node in machine_output_nodes.values()
+    )
 
-        match = machine_output_pattern.match(output_node_name)
-        if match:
-            _, item_name, = match.groups()
-            output_node = MachineOutputNode(id = output_node_name, machine_id = machine,  item = item_name, quantity = quantity)
-            link_name_to_node_map[output_node_name] = output_node
-            graph.nodes.append(output_node)
-
-            # Create edge between machine and machine output node
-            graph.edges.append(MachineOutputDirectedEdge(
-                start = link_name_to_node_map[machine],
-                end = link_name_to_node_map[output_node_name],
-                machine_id = machine,
-            ))
+    # Link endpoints are looked up in the nodes built for their kind
+    nodes_by_kind: dict[str, Mapping[str, Node]] = {
+        'machine': machine_nodes,
+        'in': machine_input_nodes,
+        'out': machine_output_nodes,
+        'source': source_nodes,
+        'source_out': source_out_nodes,
+        'sink': sink_nodes,
+        'sink_in': sink_in_nodes,
+    }
 
-    # Make edges
-    for link in links:
-        value = link["value"]
-        if math.isclose(value, 0.0):
-            continue
+    def resolve_node(name: str) -> Node:
+        return nodes_by_kind[var_meta[name].kind][name]
 
-        start = link_name_to_node_map[link["start"]]
-        end = link_name_to_node_map[link["end"]]
-
-        item = None
-        if isinstance(end, SourceNode):
-            item = end.item
-        elif isinstance(end, SinkNode):
-            item = end.item
-        elif isinstance(end, ItemNode):
-            item = end.item
-        elif isinstance(end, MachineInputNode):
-            item = end.item
-        elif isinstance(end, MachineOutputNode):
-            item = end.item
-        else:
-            raise ValueError("Invalid node type")
+    # Make edges
+    for out_link, in_link, value in links:
+        start = resolve_node(out_link)
+        end = resolve_node(in_link)
 
-        if type(end) in [SourceNode, SinkNode, ItemNode, MachineInputNode]:
+        if isinstance(end, ITEM_EDGE_END_TYPES):
             graph.edges.append(ItemDirectedEdge(
                 start = start,
                 end = end,
-                item = make_item(item),
+                item = make_item(end.item),
                 quantity = value
             ))
+        elif not isinstance(end, MachineOutputNode):
+            raise ValueError("Invalid node type")
 
     return graph
 
@@ -374,33 +298,16 @@ def draw(graph: SolutionGraph):
         return f'{formatted_number}{suffix}'
 
     def make_sources_table(sources: list[SourceNode]):
-        table = ''.join([
-            '<<table border="0" cellspacing="0" bgcolor="lightgrey">',
-            '<tr>',
-            *[f'<td border="1" PORT="{source.id}">{source.item}</td>' for source in sources],
-            '</tr>',
-            '</table>>',
-        ])
-        return table
+        cells = ''.join(f'<td border="1" PORT="{source.id}">{source.item}</td>' for source in sources)
+        return f'<<table border="0" cellspacing="0" bgcolor="lightgrey"><tr>{cells}</tr></table>>'
 
     def make_sinks_table(sinks: list[SinkNode]):
-        table = ''.join([
-            '<<table border="0" cellspacing="0">',
-            '<tr>',
-            *[f'<td border="1" PORT="{sink.id}">{sink.item}</td>' for sink in sinks],
-            '</tr>',
-            '</table>>',
-        ])
-        return table
+        cells = ''.join(f'<td border="1" PORT="{sink.id}">{sink.item}</td>' for sink in sinks)
+        return f'<<table border="0" cellspacing="0"><tr>{cells}</tr></table>>'
 
     def make_machine_table(machine: MachineNode, inputs: list[MachineInputNode], outputs: list[MachineOutputNode]):
-        input_table = ''.join([
-            '<table border="0" cellspacing="0">',
-            '<tr>',
-            *([f'<td border="1" bgcolor="#0a5161" PORT="{input.id}"><FONT color="white">{input.item}</FONT></td>' for input in inputs] if inputs else '<td></td>'),
-            '</tr>',
-            '</table>',
-        ])
+        input_cells = ''.join(f'<td border="1" bgcolor="#0a5161" PORT="{input_node.id}"><FONT color="white">{input_node.item}</FONT></td>' for input_node in inputs) or '<td></td>'
+        input_table = f'<table border="0" cellspacing="0"><tr>{input_cells}</tr></table>'
 
         machine_eu_amortized = apply_si_symbols(machine.recipe.eu_per_gametick.voltage * machine.quantity)
         eu_per_machine = apply_si_symbols(machine.recipe.eu_per_gametick.voltage)
@@ -421,13 +328,8 @@ def draw(graph: SolutionGraph):
             '</table>',
         ])
 
-        output_table = ''.join([
-            '<table border="0" cellspacing="0">',
-            '<tr>',
-            *([f'<td border="1" bgcolor="#0a5161" PORT="{output.id}"><FONT color="white">{output.item}</FONT></td>' for output in outputs] if outputs else '<td></td>'),
-            '</tr>',
-            '</table>',
-        ])
+        output_cells = ''.join(f'<td border="1" bgcolor="#0a5161" PORT="{output_node.id}"><FONT color="white">{output_node.item}</FONT></td>' for output_node in outputs) or '<td></td>'
+        output_table = f'<table border="0" cellspacing="0"><tr>{output_cells}</tr></table>'
 
         table = ''.join([
             '<<table border="0" cellpadding="0" cellspacing="0">',
@@ -541,8 +443,28 @@ def draw(graph: SolutionGraph):
         nodesed='0.25',
     )
 
+    # Bucket nodes by type in a single pass
+    sourcesMap: dict[str, SourceNode] = {}
+    sinksMap: dict[str, SinkNode] = {}
+    machineMap: dict[str, MachineNode] = {}
+    machineInputs: list[MachineInputNode] = []
+    machineOutputs: list[MachineOutputNode] = []
+    itemNodeMap: dict[str, ItemNode] = {}
+    for node in graph.nodes:
+        if isinstance(node, SourceNode):
+            sourcesMap[node.id] = node
+        elif isinstance(node, SinkNode):
+            sinksMap[node.id] = node
+        elif isinstance(node, MachineNode):
+            machineMap[node.id] = node
+        elif isinstance(node, MachineInputNode):
+            machineInputs.append(node)
+        elif isinstance(node, MachineOutputNode):
+            machineOutputs.append(node)
+        elif isinstance(node, ItemNode):
+            itemNodeMap[node.id] = node
+
     # Source Nodes
-    sourcesMap: dict[str, SourceNode] = dict([(node.id, node) for node in graph.nodes if type(node) is SourceNode])
     with dot.subgraph(name='cluster_sources') as subgraph:
         subgraph.attr(rank='source', pad='0', margin='0', rankdir='LR', peripheries='0')
         subgraph.node('sources', make_sources_table(list(sourcesMap.values())), **{
@@ -552,30 +474,30 @@ def draw(graph: SolutionGraph):
         })
     
     # Sink Nodes
-    sinksMap: dict[str, SinkNode] = dict([(node.id, node) for node in graph.nodes if type(node) is SinkNode])
     with dot.subgraph(name='cluster_sinks') as subgraph:
         subgraph.attr(rank='sink', color='lightgrey', style='filled', pad='0', margin='0')
         subgraph.node('sinks', make_sinks_table(list(sinksMap.values())), **{
             'shape': 'plain',
         })
 
-    # Machine Nodes
-    machineMap: dict[str, MachineNode] = dict([(node.id, node) for node in graph.nodes if type(node) is MachineNode])
-    
+    by_machine_id = operator.attrgetter('machine_id')
+
     # Machine Input Node
-    machineInputsMap: dict[str, list[MachineInputNode]] = defaultdict(list)
-    for machineInput in [node for node in graph.nodes if type(node) is MachineInputNode]:
-        machineInputsMap[machineInput.machine_id].append(machineInput)
+    machineInputs.sort(key=by_machine_id)
+    machineInputsMap: dict[str, list[MachineInputNode]] = {
+        machine_id: list(nodes) for machine_id, nodes in itertools.groupby(machineInputs, key=by_machine_id)
+    }
 
     # Machine Output Nodes
-    machineOutputsMap: dict[str, list[MachineOutputNode]] = defaultdict(list)
-    for machineOutput in [node for node in graph.nodes if type(node) is MachineOutputNode]:
-        machineOutputsMap[machineOutput.machine_id].append(machineOutput)
+    machineOutputs.sort(key=by_machine_id)
+    machineOutputsMap: dict[str, list[MachineOutputNode]] = {
+        machine_id: list(nodes) for machine_id, nodes in itertools.groupby(machineOutputs, key=by_machine_id)
+    }
 
     # Combine machine, machine inputs, and machine outputs into 1 table node
     for (machine_id, machineNode) in machineMap.items():
-        inputs = machineInputsMap[machine_id]
-        outputs = machineOutputsMap[machine_id]
+        inputs = machineInputsMap.get(machine_id, [])
+        outputs = machineOutputsMap.get(machine_id, [])
         with dot.subgraph(name=f'cluster_{machine_id}') as subgraph:
             subgraph.attr(**{
                 'margin': '0',
@@ -586,31 +508,38 @@ def draw(graph: SolutionGraph):
                 'margin': '0',
             })
 
-    # Get directed edges
-    item_directed_edges: list[ItemDirectedEdge] = [edge for edge in graph.edges if type(edge) is ItemDirectedEdge]
+    # Bucket edges by type in a single pass
+    item_directed_edges: list[ItemDirectedEdge] = []
+    machine_input_edges: list[MachineInputDirectedEdge] = []
+    machine_output_edges: list[MachineOutputDirectedEdge] = []
+    for edge in graph.edges:
+        if isinstance(edge, ItemDirectedEdge):
+            item_directed_edges.append(edge)
+        elif isinstance(edge, MachineInputDirectedEdge):
+            machine_input_edges.append(edge)
+        elif isinstance(edge, MachineOutputDirectedEdge):
+            machine_output_edges.append(edge)
+
+    # Emit edges grouped by destination so graphviz sees a stable, clustered order
+    item_directed_edges.sort(key=lambda edge: (type(edge.end).__name__, getattr(edge.end, 'machine_id', ''), edge.end.id))
 
-    # Get machine input edges
-    machine_input_edges: list[MachineInputDirectedEdge] = [edge for edge in graph.edges if type(edge) is MachineInputDirectedEdge]
-
-    # Get machine output edges
-    machine_output_edges: list[MachineOutputDirectedEdge] = [edge for edge in graph.edges if type(edge) is MachineOutputDirectedEdge]
-    
     # Group together ItemNodes and their connecting edges.
     # If an edge does not connect to an ItemNode, add it to another list for processing
-    itemNodeMap: dict[str, ItemNode] = { node.id: node for node in graph.nodes if type(node) is ItemNode }
-    itemNodeConnectedEdges: dict[str, list[ItemDirectedEdge]] = defaultdict(list)
-    edges_without_item_nodes: list[ItemDirectedEdge] = []
-    for edge in item_directed_edges:
-        startItemNode = itemNodeMap.get(edge.start.id)
-        endItemNode = itemNodeMap.get(edge.end.id)
-        if startItemNode:
-            itemNodeConnectedEdges[startItemNode.id].append(edge)
-        elif endItemNode:
-            itemNodeConnectedEdges[endItemNode.id].append(edge)
-        else:
-            edges_without_item_nodes.append(edge)
-
-    # Draw edges connected to ItemNodes
+    def connected_item_node_id(edge: ItemDirectedEdge) -> str:
+        if edge.start.id in itemNodeMap:
+            return edge.start.id
+        if edge.end.id in itemNodeMap:
+            return edge.end.id
+        return ''
+
+    itemNodeConnectedEdges: dict[str, list[ItemDirectedEdge]] = {
+        item_node_id: list(edges)
+        for item_node_id, edges in itertools.groupby(sorted(item_directed_edges, key=connected_item_node_id), key=connected_item_node_id)
+    }
+    edges_without_item_nodes: list[ItemDirectedEdge] = itemNodeConnectedEdges.pop('', [])
+
+    # Pick a color for every ItemNode that stays in the graph
+    item_node_colors: dict[str, str] = {}
     for item_node_id, item_edges in itemNodeConnectedEdges.items():
         # If a node has only 2 connected edges, the node is redundant and the 2 edges
         # can be combined into 1.
@@ -631,41 +560,49 @@ def draw(graph: SolutionGraph):
             edges_without_item_nodes.append(combined_edge)
             continue
 
-        edge_color = next(EDGE_COLOR_ITERATOR)
+        item_node_colors[item_node_id] = next(EDGE_COLOR_ITERATOR)
+
+    # Draw the remaining ItemNodes in a single subgraph
+    if item_node_colors:
         with dot.subgraph(name='regular') as subgraph:
-            subgraph.node(item_node_id, **{
-                'shape': 'point',
-                'width': '0.03',
-                'height': '0.03',
-                'color': edge_color,
-            })
-        
-        for edge in item_edges:
+            for item_node_id, edge_color in item_node_colors.items():
+                subgraph.node(item_node_id, **{
+                    'shape': 'point',
+                    'width': '0.03',
+                    'height': '0.03',
+                    'color': edge_color,
+                })
+
+    # Draw edges connected to ItemNodes
+    for item_node_id, edge_color in item_node_colors.items():
+        for edge in itemNodeConnectedEdges[item_node_id]:
             draw_item_edge(dot, edge, edge_color)
 
     # Connect edges without ItemNodes
     for edge in edges_without_item_nodes:
         draw_item_edge(dot, edge, next(EDGE_COLOR_ITERATOR))
 
-    # Build machine input edges
+    # Group machine input and output edges by machine so each cluster is opened once
+    machine_port_edges: dict[str, list[tuple[str, str]]] = defaultdict(list)
     for input_edge in machine_input_edges:
-        start_id = f'{input_edge.machine_id}:{input_edge.start.id}'
-        end_id = f'{input_edge.machine_id}:{input_edge.machine_id}'
-        with dot.subgraph(name=f'cluster_{input_edge.machine_id}') as subgraph:
-            subgraph.edge(start_id, end_id, '', **{
-                'style': 'invis',
-                'margin': '0',
-            })
-
-    # Build machine output edges
+        machine_port_edges[input_edge.machine_id].append((
+            f'{input_edge.machine_id}:{input_edge.start.id}',
+            f'{input_edge.machine_id}:{input_edge.machine_id}',
+        ))
     for output_edge in machine_output_edges:
-        start_id = f'{output_edge.machine_id}:{output_edge.machine_id}'
-        end_id = f'{output_edge.machine_id}:{output_edge.end.id}'
-        with dot.subgraph(name=f'cluster_{output_edge.machine_id}') as subgraph:
-            subgraph.edge(start_id, end_id, '', **{
-                'style': 'invis',
-                'margin': '0',
-            })
+        machine_port_edges[output_edge.machine_id].append((
+            f'{output_edge.machine_id}:{output_edge.machine_id}',
+            f'{output_edge.machine_id}:{output_edge.end.id}',
+        ))
+
+    # Build machine input and output edges
+    for machine_id, port_edges in machine_port_edges.items():
+        with dot.subgraph(name=f'cluster_{machine_id}') as subgraph:
+            for start_id, end_id in port_edges:
+                subgraph.edge(start_id, end_id, '', **{
+                    'style': 'invis',
+                    'margin': '0',
+                })
 
     # Add overview node
     dot.node('overview', make_overview_table(list(sourcesMap.values()), list(sinksMap.values()), list(machineMap.values())), **{
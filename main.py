@@ -1,8 +1,7 @@
 from pprint import pprint
-import pyomo.environ as pyomo # type: ignore
 from config_reader import load_factory_config
 from grapher import build_solution_graph, draw
-from solver import solve
+from solver import solve, solve_direct_lp, solve_highs
 import argparse
 import args
     
@@ -10,6 +9,7 @@ def main():
     parser = argparse.ArgumentParser(description="Generate GTNH factory diagrams from factory configuration files.")
     parser.add_argument("factory_config", type=str, help="Path to the factory configuration file. (yaml/json)")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument("--backend", choices=["pyomo", "direct_lp", "highs"], default="pyomo", help="Solve through Pyomo, write the LP file directly and run CBC on it, or solve in process with HiGHS")
     parsed_args = parser.parse_args()
     
     # Store the parsed arguments in the args module
@@ -27,15 +27,19 @@ def main():
         exit(1)
 
     print("Solving factory constraints.")
-    model, results, machine_map = solve(factory_config.recipes, factory_config.targets[0])
+    if args.get_backend() == "direct_lp":
+        variables, network = solve_direct_lp(factory_config.recipes, factory_config.targets[0])
+    elif args.get_backend() == "highs":
+        variables, network = solve_highs(factory_config.recipes, factory_config.targets[0])
+    else:
+        variables, results, network = solve(factory_config.recipes, factory_config.targets[0])
 
     # Debug model variables
     if args.is_verbose():
-        variables = {v.name.strip("'"): v.value for v in model.component_objects(pyomo.Var, active=True) for v in v.values()}
         pprint(variables)
 
     print("Building solution graph.")
-    graph = build_solution_graph(model, machine_map)
+    graph = build_solution_graph(variables, network.var_meta | network.edge_meta, network.machine_id_to_recipe_map)
     
     print("Outputing solution diagram.")
     draw(graph)
@@ -3,6 +3,9 @@ from dataclasses import dataclass
 from gamelogic.machines import MachineRecipe
 from gamelogic.items import Item, make_item
 
+# Solver round-off at or below this is treated as zero, e.g. a flow that gets no edge
+ZERO_TOLERANCE = 1e-9
+
 @dataclass(frozen=True)
 class TargetRate:
     item: Item
@@ -13,5 +16,16 @@ class FactoryConfig:
     recipes: list[MachineRecipe]
     targets: list[TargetRate]
 
+@dataclass(slots=True)
+class VarMeta:
+    '''What an LP variable stands for, recorded when it is created so its name never has to be parsed.'''
+    # One of 'machine', 'in', 'out', 'source', 'source_out', 'sink', 'sink_in', 'tax' or 'link'
+    kind: str
+    # Empty when the variable has no item or machine
+    item: str = ''
+    machine: str = ''
+    # Names of the OUT and IN links a 'link' connects
+    endpoints: tuple[str, str] = ('', '')
+
 def make_target(itemname: str, quantity: float) -> TargetRate:
     return TargetRate(make_item(itemname), quantity)
@@ -1,154 +1,423 @@
 from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import cache
+import os
+import subprocess
+import tempfile
 import pyomo.environ as pyomo # type: ignore
 from pyomo.opt import SolverResults # type: ignore
 from gamelogic.machines import MachineRecipe
-from models import Item, TargetRate
+from models import ZERO_TOLERANCE, Item, TargetRate, VarMeta
 
-def solve(
-        recipes: list[MachineRecipe],
-        target: TargetRate,
-        solver = pyomo.SolverFactory('cbc'),
-        model = pyomo.ConcreteModel()
-        ) -> tuple[pyomo.Model, SolverResults, dict[str, MachineRecipe]]:
-    machine_index = 0
-    machines: list[str] = [] 
-    machine_id_to_recipe_map: dict[str, MachineRecipe] = {}
+@dataclass
+class FactoryNetwork:
+    '''Every variable in the factory LP, numbered by id, and how they relate.'''
+    # Variable id -> name, used for diagnostics and the solution graph
+    names: list[str] = field(default_factory=list)
+    # Variable name -> what it stands for, so the solution graph never parses names
+    var_meta: dict[str, VarMeta] = field(default_factory=dict)
+    # Routed OUT_TO_IN edge name -> what it connects, replaced on every route_flows call
+    edge_meta: dict[str, VarMeta] = field(default_factory=dict)
+    machine_id_to_recipe_map: dict[str, MachineRecipe] = field(default_factory=dict)
+    machines: list[int] = field(default_factory=list)
+    # Machine IN/OUT link -> owning machine and its rate per machine
+    link_machine: dict[int, int] = field(default_factory=dict)
+    link_rate: dict[int, float] = field(default_factory=dict)
+    # Source -> SOURCE_OUT, sink -> SINK_IN and tax -> taxed source
+    source_out_of: dict[int, int] = field(default_factory=dict)
+    sink_in_of: dict[int, int] = field(default_factory=dict)
+    # SOURCE_OUT and SINK_IN are left out of the LP: each is (coefficient, variable) times its
+    # source or sink, and gets its value from it after the solve
+    substitutes: dict[int, tuple[float, int]] = field(default_factory=dict)
+    source_of_tax: dict[int, int] = field(default_factory=dict)
+    item_sinks: dict[Item, int] = field(default_factory=dict)
+    # Item -> links producing it (machine OUTs, then SOURCE_OUT) and consuming it (machine INs, then SINK_IN)
+    item_producers: dict[Item, list[int]] = field(default_factory=lambda: defaultdict(list))
+    item_consumers: dict[Item, list[int]] = field(default_factory=lambda: defaultdict(list))
+
+    def add_variable(self, name: str, meta: VarMeta) -> int:
+        self.names.append(name)
+        self.var_meta[name] = meta
+        return len(self.names) - 1
+
+def build_network(recipes: list[MachineRecipe], target: TargetRate) -> FactoryNetwork:
+    network = FactoryNetwork()
     machine_outputs: set[Item] = set()
 
-    item_out_links: dict[Item, list[str]] = defaultdict(list)
-    item_in_links: dict[Item, list[str]] = defaultdict(list)
+    item_out_links = network.item_producers
+    item_in_links = network.item_consumers
 
-    for recipe in recipes:
+    # Number every machine and its IN/OUT links
+    for machine_index, recipe in enumerate(recipes):
         machine_name = f'M{machine_index}'
-        machine_index += 1
-        machines.append(machine_name)
-        machine_id_to_recipe_map[machine_name] = recipe
-
-        # Make machine variable and empty constraint list
-        setattr(model, machine_name, pyomo.Var(domain=pyomo.NonNegativeReals))
-        setattr(model, f'{machine_name}_constraints', pyomo.ConstraintList())
-        machine_variable = getattr(model, machine_name)
+        machine = network.add_variable(machine_name, VarMeta('machine', machine=machine_name))
+        network.machines.append(machine)
+        network.machine_id_to_recipe_map[machine_name] = recipe
+        ticks = recipe.duration.as_ticks()
 
-        # Make input variables and constraints
         for itemstack in recipe.inputs:
-            item_in_link = f'{machine_name}_IN_{itemstack.item.name}'
-            setattr(model, item_in_link, pyomo.Var(domain=pyomo.NonNegativeReals))
+            item_in_link = network.add_variable(f'{machine_name}_IN_{itemstack.item.name}', VarMeta('in', itemstack.item.name, machine_name))
             item_in_links[itemstack.item].append(item_in_link)
-            input_variable = getattr(model, item_in_link)
+            network.link_machine[item_in_link] = machine
             # Update rate calculation:
-            rate = itemstack.quantity / recipe.duration.as_ticks()
-            getattr(model, f'{machine_name}_constraints').add(machine_variable == input_variable / rate)
+            network.link_rate[item_in_link] = itemstack.quantity / ticks
 
-        # Make output variables and constraints
         for itemstack in recipe.outputs:
             machine_outputs.add(itemstack.item)
-            item_out_link = f'{machine_name}_OUT_{itemstack.item.name}'
-            setattr(model, item_out_link, pyomo.Var(domain=pyomo.NonNegativeReals))
+            item_out_link = network.add_variable(f'{machine_name}_OUT_{itemstack.item.name}', VarMeta('out', itemstack.item.name, machine_name))
             item_out_links[itemstack.item].append(item_out_link)
-            output_variable = getattr(model, item_out_link)
+            network.link_machine[item_out_link] = machine
             # Update rate calculation:
-            rate = itemstack.quantity / recipe.duration.as_ticks()
-            getattr(model, f'{machine_name}_constraints').add(machine_variable == output_variable / rate)
-
-        # Add recipe constraints between inputs, outputs
-        input_output_pairs = [(i, o) for i in recipe.inputs for o in recipe.outputs]
-        for in_itemstack, out_itemstack in input_output_pairs:
-            in_variable = getattr(model, f'{machine_name}_IN_{in_itemstack.item.name}')
-            out_variable = getattr(model, f'{machine_name}_OUT_{out_itemstack.item.name}')
-            # Update rate calculations:
-            in_rate = in_itemstack.quantity / recipe.duration.as_ticks()
-            out_rate = out_itemstack.quantity / recipe.duration.as_ticks()
-            getattr(model, f'{machine_name}_constraints').add((out_variable / out_rate) - (in_variable / in_rate) == 0)
-    
-    # Make sources for each IN link item
-    item_source_map: dict[Item, str] = dict()
-    model.SOURCE_CONSTRAINTS = pyomo.ConstraintList()
+            network.link_rate[item_out_link] = itemstack.quantity / ticks
+
+    # Number sources for each IN link item
+    item_sources: dict[Item, int] = {}
     for item in item_in_links.keys():
-        source_name = f'SOURCE_{item.name}'
-        source_out_name = f'SOURCE_OUT_{item.name}'
-        setattr(model, source_name, pyomo.Var(domain=pyomo.Reals))
-        setattr(model, source_out_name, pyomo.Var(domain=pyomo.NonNegativeReals))
+        source = network.add_variable(f'SOURCE_{item.name}', VarMeta('source', item.name))
+        source_out = network.add_variable(f'SOURCE_OUT_{item.name}', VarMeta('source_out', item.name))
+        item_sources[item] = source
+        network.source_out_of[source] = source_out
+        network.substitutes[source_out] = (-1.0, source)
+        item_out_links[item].append(source_out)
 
-        # Source value should be the negative of its outgoing quantity
-        source_variable = getattr(model, source_name)
-        source_out_variable = getattr(model, source_out_name)
-        model.SOURCE_CONSTRAINTS.add(source_variable + source_out_variable == 0)
+    # Number sinks for each OUT link item. Items no machine makes could only be sunk
+    # straight from their source at a cost, so they get no sink unless they are the target.
+    for item in item_out_links.keys():
+        if item not in machine_outputs and item != target.item:
+            continue
+        sink = network.add_variable(f'SINK_{item.name}', VarMeta('sink', item.name))
+        sink_in = network.add_variable(f'SINK_IN_{item.name}', VarMeta('sink_in', item.name))
+        network.item_sinks[item] = sink
+        network.sink_in_of[sink] = sink_in
+        network.substitutes[sink_in] = (1.0, sink)
+        item_in_links[item].append(sink_in)
 
-        # Source values must be less than or equal to 0
-        model.SOURCE_CONSTRAINTS.add(source_variable <= 0)
+    # Number taxes on sources which are a machine output
+    for item, source in item_sources.items():
+        if item in machine_outputs:
+            network.source_of_tax[network.add_variable(f'SOURCE_TAX_{item.name}', VarMeta('tax', item.name))] = source
 
-        item_source_map[item] = source_name
-        item_out_links[item].append(source_out_name)
+    return network
 
-    # Make sinks for each OUT link item
-    item_sink_map: dict[Item, str] = dict()
-    model.SINK_CONSTRAINTS = pyomo.ConstraintList()
-    for item in item_out_links.keys():
-        sink_name = f'SINK_{item.name}'
-        sink_in_name = f'SINK_IN_{item.name}'
-        setattr(model, sink_name, pyomo.Var(domain=pyomo.NonNegativeReals))
-        setattr(model, sink_in_name, pyomo.Var(domain=pyomo.NonNegativeReals))
-
-        # Sink value should be equal to its incoming quantity
-        sink_variable = getattr(model, sink_name)
-        sink_in_variable = getattr(model, sink_in_name)
-        model.SINK_CONSTRAINTS.add(sink_variable == sink_in_variable)
-
-        # Sink values must be greater than or equal to 0
-        model.SINK_CONSTRAINTS.add(sink_variable >= 0)
-
-        item_sink_map[item] = sink_name
-        item_in_links[item].append(sink_in_name)
-    
-    # Add links between all OUTs and INs of the same item
-    incoming_link_map: dict[str, list[str]] = defaultdict(list)
-    outgoing_link_map: dict[str, list[str]] = defaultdict(list)
-    for item in item_out_links.keys():
-        output_input_pairs = [(o, i) for i in item_in_links[item] for o in item_out_links[item]]
-        for out_link, in_link in output_input_pairs:
-            link_name = f'{out_link}_TO_{in_link}'
-            setattr(model, link_name, pyomo.Var(domain=pyomo.NonNegativeReals))
-            incoming_link_map[in_link].append(link_name)
-            outgoing_link_map[out_link].append(link_name)
-    
-    # In links must sum to their connecting edges
-    model.IN_LINK_EDGE_CONSTRAINTS = pyomo.ConstraintList()
-    for in_link, incoming_edges in incoming_link_map.items():
-        model.IN_LINK_EDGE_CONSTRAINTS.add(getattr(model, in_link) == sum([getattr(model, edge) for edge in incoming_edges]))
-
-    # Out links must sum to their connecting edges
-    model.OUT_LINK_EDGE_CONSTRAINTS = pyomo.ConstraintList()
-    for out_link, outgoing_edges in outgoing_link_map.items():
-        model.OUT_LINK_EDGE_CONSTRAINTS.add(getattr(model, out_link) == sum([getattr(model, edge) for edge in outgoing_edges]))
+@cache
+def default_solver():
+    # Created on first use and shared by every later solve.
+    # Prefer HiGHS in process when highspy is installed, skipping CBC's LP file round trip.
+    highs = pyomo.SolverFactory('appsi_highs')
+    if highs.available(exception_flag=False):
+        return highs
+    return pyomo.SolverFactory('cbc')
+
+def solve(
+        recipes: list[MachineRecipe],
+        target: TargetRate,
+        solver = None,
+        model = None
+        ) -> tuple[dict[str, float], SolverResults, FactoryNetwork]:
+    '''Solve the factory through Pyomo, returning the solved values by variable name.
+
+    The model is not returned so it can be freed once its values are read; pass in
+    a model to keep a handle on it, e.g. to read the objective value.
+    '''
+    if solver is None:
+        solver = default_solver()
+    if model is None:
+        model = pyomo.ConcreteModel()
+
+    network = build_network(recipes, target)
+    link_machine = network.link_machine
+    link_rate = network.link_rate
+    source_out_of = network.source_out_of
+    sink_in_of = network.sink_in_of
+    source_of_tax = network.source_of_tax
+    item_producers = network.item_producers
+    item_consumers = network.item_consumers
+
+    # Create each kind of variable as a single component indexed by variable id
+    model.MACHINES = pyomo.Set(initialize=network.machines, ordered=True)
+    model.LINKS = pyomo.Set(initialize=link_machine.keys(), ordered=True)
+    model.SOURCES = pyomo.Set(initialize=source_out_of.keys(), ordered=True)
+    model.SINKS = pyomo.Set(initialize=sink_in_of.keys(), ordered=True)
+    model.TAXES = pyomo.Set(initialize=source_of_tax.keys(), ordered=True)
+    model.machine = pyomo.Var(model.MACHINES, domain=pyomo.NonNegativeReals)
+    model.link = pyomo.Var(model.LINKS, domain=pyomo.NonNegativeReals)
+    model.source = pyomo.Var(model.SOURCES, domain=pyomo.Reals)
+    model.sink = pyomo.Var(model.SINKS, domain=pyomo.NonNegativeReals)
+    model.tax = pyomo.Var(model.TAXES, domain=pyomo.NonNegativeReals)
+
+    # Look up variables by id without going back through the model
+    variables: dict[int, pyomo.Var] = {}
+    for component in (model.machine, model.link, model.source, model.sink, model.tax):
+        variables.update(component.items())
+    # SOURCE_OUT and SINK_IN are written in terms of their source or sink
+    for variable, (coefficient, base) in network.substitutes.items():
+        variables[variable] = coefficient * variables[base]
+
+    # Each machine link's rate fixes the number of machines
+    model.MACHINE_LINK_CONSTRAINTS = pyomo.Constraint(
+        model.LINKS,
+        rule=lambda model, link: model.link[link] == link_rate[link] * model.machine[link_machine[link]])
+
+    # Source values must be less than or equal to 0
+    model.SOURCE_BOUND_CONSTRAINTS = pyomo.Constraint(
+        model.SOURCES,
+        rule=lambda model, source: model.source[source] <= 0)
+
+    # Sink values must be greater than or equal to 0
+    model.SINK_BOUND_CONSTRAINTS = pyomo.Constraint(
+        model.SINKS,
+        rule=lambda model, sink: model.sink[sink] >= 0)
+
+    # Everything produced of an item must be consumed; edges are routed after the solve
+    model.ITEM_FLOW_CONSTRAINTS = pyomo.Constraint(
+        list(item_producers.keys()),
+        rule=lambda model, item:                                                    \
+            pyomo.quicksum(variables[link] for link in item_producers[item])       \
+            == pyomo.quicksum(variables[link] for link in item_consumers[item]))
 
     # Add target
-    model.target = pyomo.Constraint(rule=lambda model: getattr(model, f'SINK_{target.item.name}') >= target.quantity_per_second)
+    model.target = pyomo.Constraint(expr=model.sink[network.item_sinks[target.item]] >= target.quantity_per_second)
 
     # Add taxes on sources which are a machine output
-    taxes: list[str] = []
-    model.SOURCE_TAX_CONSTRAINTS = pyomo.ConstraintList()
-    for item, source_name in item_source_map.items():
-        if item in machine_outputs:
-            source_tax_name = f'SOURCE_TAX_{item.name}'
-            setattr(model, source_tax_name, pyomo.Var(domain=pyomo.NonNegativeReals))
-            tax_variable = getattr(model, source_tax_name)
-            source_variable = getattr(model, source_name)
-            model.SOURCE_TAX_CONSTRAINTS.add(tax_variable == source_variable * -50000)
-            taxes.append(source_tax_name)
+    model.SOURCE_TAX_CONSTRAINTS = pyomo.Constraint(
+        model.TAXES,
+        rule=lambda model, tax: model.tax[tax] == model.source[source_of_tax[tax]] * -50000)
 
     # Add objective
-    sources = item_source_map.values()
     model.objective = pyomo.Objective(
-        # rule = minimize: sum(machines) + sum(source inputs) + sum(tax)
-        rule = lambda model:                                            \
-            sum([getattr(model, machine) for machine in machines])      \
-            + -1 * sum([getattr(model, source) for source in sources])  \
-            + sum([getattr(model, tax) for tax in taxes]),
+        # minimize: sum(machines) + sum(source inputs) + sum(tax)
+        expr = pyomo.quicksum(model.machine.values())   \
+            - pyomo.quicksum(model.source.values())     \
+            + pyomo.quicksum(model.tax.values()),
         sense = pyomo.minimize,
     )
 
     # Solve
     result = solver.solve(model)
 
-    # TODO: Export a more useful object than a pyomo model
-    return model, result, machine_id_to_recipe_map
+    return solution_values(model, network), result, network
+
+def solution_values(model: pyomo.Model, network: FactoryNetwork) -> dict[str, float]:
+    # Every variable is indexed by its id in the network
+    names = network.names
+    return complete_solution({
+        names[index]: variable.value
+        for component in model.component_objects(pyomo.Var, active=True)
+        for index, variable in component.items()
+    }, network)
+
+def complete_solution(variables: dict[str, float], network: FactoryNetwork) -> dict[str, float]:
+    '''Fill in the values left out of the LP: substituted SOURCE_OUT/SINK_IN links and routed edges.
+
+    Updates variables in place and replaces network.edge_meta, see route_flows.
+    '''
+    names = network.names
+    for variable, (coefficient, base) in network.substitutes.items():
+        value = variables[names[base]]
+        variables[names[variable]] = coefficient * value if value else 0.0
+    return route_flows(variables, network)
+
+def route_flows(variables: dict[str, float], network: FactoryNetwork) -> dict[str, float]:
+    '''Split each item's solved flow into OUT_TO_IN edges for the solution graph.
+
+    The LP only balances each item's total flow, so any split between its links
+    is optimal. Producers are matched to consumers in order, which feeds machines
+    from machines first and leaves sources and sinks to cover the rest.
+
+    Edge values are added to variables in place. Their metadata replaces
+    network.edge_meta, so it only ever describes the latest routing; network.var_meta
+    is left holding the LP's own variables.
+    '''
+    names = network.names
+    edge_meta: dict[str, VarMeta] = {}
+    for item, producers in network.item_producers.items():
+        consumers = network.item_consumers[item]
+        remaining = [variables[names[in_link]] or 0.0 for in_link in consumers]
+        position = 0
+        for out_link in producers:
+            supply = variables[names[out_link]] or 0.0
+            while supply > ZERO_TOLERANCE and position < len(consumers):
+                flow = min(supply, remaining[position])
+                if flow > ZERO_TOLERANCE:
+                    out_name, in_name = names[out_link], names[consumers[position]]
+                    edge_name = f'{out_name}_TO_{in_name}'
+                    variables[edge_name] = flow
+                    edge_meta[edge_name] = VarMeta('link', item.name, endpoints=(out_name, in_name))
+                supply -= flow
+                remaining[position] -= flow
+                if remaining[position] <= ZERO_TOLERANCE:
+                    position += 1
+    network.edge_meta = edge_meta
+    return variables
+
+Terms = list[tuple[float, int]]
+
+@dataclass
+class LinearProblem:
+    '''The factory LP as plain rows over variable ids, for backends that skip Pyomo.'''
+    # Objective to minimize, as (coefficient, variable id) terms
+    objective: Terms = field(default_factory=list)
+    # Constraint rows as (terms, sense, rhs) with sense one of '=', '<=' or '>='
+    rows: list[tuple[Terms, str, float]] = field(default_factory=list)
+    # Variables without a lower bound; every other variable is non-negative
+    free: list[int] = field(default_factory=list)
+
+    def add_eq(self, terms: Terms, rhs: float = 0.0):
+        self.rows.append((terms, '=', rhs))
+
+    def add_le(self, terms: Terms, rhs: float = 0.0):
+        self.rows.append((terms, '<=', rhs))
+
+    def add_ge(self, terms: Terms, rhs: float = 0.0):
+        self.rows.append((terms, '>=', rhs))
+
+    def add_free(self, variable: int):
+        self.free.append(variable)
+
+    def write(self, path: str):
+        '''Write the LP in CPLEX LP format, naming each variable x<id>.
+
+        Variable names contain spaces and other characters the LP format does not
+        allow, so every variable is written under its id instead.
+        '''
+        def expression(terms: Terms) -> str:
+            return ' '.join(f'{"-" if coefficient < 0 else "+"} {abs(coefficient)!r} x{variable}' for coefficient, variable in terms)
+
+        # Collect the whole file and write it at once
+        lines = ['minimize', f' obj: {expression(self.objective)}', 'subject to']
+        lines.extend(f' c{index}: {expression(terms)} {sense} {rhs!r}' for index, (terms, sense, rhs) in enumerate(self.rows))
+        lines.append('bounds')
+        # Variables are non-negative by default
+        lines.extend(f' x{variable} free' for variable in self.free)
+        lines.append('end\n')
+        with open(path, 'w') as lp_file:
+            lp_file.write('\n'.join(lines))
+
+def build_linear_problem(network: FactoryNetwork, target: TargetRate) -> LinearProblem:
+    problem = LinearProblem()
+
+    # Each machine link's rate fixes the number of machines
+    for link, machine in network.link_machine.items():
+        problem.add_eq([(1.0, link), (-network.link_rate[link], machine)])
+
+    # Source values are never positive
+    for source in network.source_out_of.keys():
+        problem.add_le([(1.0, source)])
+
+    # Sink values are never negative
+    for sink in network.sink_in_of.keys():
+        problem.add_ge([(1.0, sink)])
+
+    # SOURCE_OUT and SINK_IN are written in terms of their source or sink
+    def term(sign: float, link: int) -> tuple[float, int]:
+        coefficient, variable = network.substitutes.get(link, (1.0, link))
+        return (sign * coefficient, variable)
+
+    # Everything produced of an item must be consumed
+    for item, producers in network.item_producers.items():
+        consumers = network.item_consumers[item]
+        problem.add_eq([*(term(1.0, link) for link in producers), *(term(-1.0, link) for link in consumers)])
+
+    # Target
+    problem.add_ge([(1.0, network.item_sinks[target.item])], float(target.quantity_per_second))
+
+    # Taxes on sources which are a machine output
+    for tax, source in network.source_of_tax.items():
+        problem.add_eq([(1.0, tax), (50000.0, source)])
+
+    # minimize: sum(machines) + sum(source inputs) + sum(tax)
+    problem.objective = [
+        *((1.0, machine) for machine in network.machines),
+        *((-1.0, source) for source in network.source_out_of.keys()),
+        *((1.0, tax) for tax in network.source_of_tax.keys()),
+    ]
+
+    # Sources are unbounded
+    for source in network.source_out_of.keys():
+        problem.add_free(source)
+
+    return problem
+
+def read_cbc_solution(path: str, network: FactoryNetwork) -> dict[str, float]:
+    '''Read a CBC solution file back into values keyed by variable name.'''
+    with open(path) as solution_file:
+        status = solution_file.readline().strip()
+        if not status.startswith('Optimal'):
+            raise RuntimeError(f'CBC did not find an optimal solution: {status}')
+
+        # Each row is "[**] index x<id> value reduced_cost"; CBC only lists non-zero values
+        values = dict.fromkeys(network.names, 0.0)
+        for line in solution_file:
+            columns = line.replace('**', '').split()
+            if len(columns) >= 3:
+                values[network.names[int(columns[1][1:])]] = float(columns[2])
+
+    return values
+
+def solve_direct_lp(
+        recipes: list[MachineRecipe],
+        target: TargetRate,
+        cbc: str = 'cbc'
+        ) -> tuple[dict[str, float], FactoryNetwork]:
+    '''Solve the factory by writing the LP file directly and running CBC on it, bypassing Pyomo.'''
+    network = build_network(recipes, target)
+    with tempfile.TemporaryDirectory() as directory:
+        lp_path = os.path.join(directory, 'factory.lp')
+        solution_path = os.path.join(directory, 'factory.sol')
+        build_linear_problem(network, target).write(lp_path)
+        subprocess.run([cbc, lp_path, 'solve', 'solu', solution_path], check=True, capture_output=True)
+        variables = read_cbc_solution(solution_path, network)
+    return complete_solution(variables, network), network
+
+def solve_highs(
+        recipes: list[MachineRecipe],
+        target: TargetRate
+        ) -> tuple[dict[str, float], FactoryNetwork]:
+    '''Solve the factory in process with HiGHS, loading the constraint matrix directly.
+
+    Needs the optional highspy package.
+    '''
+    import highspy # type: ignore
+
+    network = build_network(recipes, target)
+    problem = build_linear_problem(network, target)
+    infinity = highspy.kHighsInf
+
+    # Substituted SOURCE_OUT/SINK_IN links never appear in the LP, so they get no column
+    columns = [variable for variable in range(len(network.names)) if variable not in network.substitutes]
+    column_of = {variable: column for column, variable in enumerate(columns)}
+    column_count = len(columns)
+    costs = [0.0] * column_count
+    for coefficient, variable in problem.objective:
+        costs[column_of[variable]] += coefficient
+    lower_bounds = [0.0] * column_count
+    for variable in problem.free:
+        lower_bounds[column_of[variable]] = -infinity
+
+    # Assemble the constraint matrix row by row in compressed sparse row form
+    row_lower: list[float] = []
+    row_upper: list[float] = []
+    row_starts: list[int] = []
+    indices: list[int] = []
+    values: list[float] = []
+    for terms, sense, rhs in problem.rows:
+        row_lower.append(-infinity if sense == '<=' else rhs)
+        row_upper.append(infinity if sense == '>=' else rhs)
+        row_starts.append(len(indices))
+        for coefficient, variable in terms:
+            indices.append(column_of[variable])
+            values.append(coefficient)
+
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', False)
+    highs.addCols(column_count, costs, lower_bounds, [infinity] * column_count, 0, [], [], [])
+    highs.addRows(len(row_starts), row_lower, row_upper, len(indices), row_starts, indices, values)
+    highs.run()
+
+    status = highs.getModelStatus()
+    if status != highspy.HighsModelStatus.kOptimal:
+        raise RuntimeError(f'HiGHS did not find an optimal solution: {highs.modelStatusToString(status)}')
+
+    solution = highs.getSolution().col_value
+    variables = {network.names[variable]: value for variable, value in zip(columns, solution)}
+    return complete_solution(variables, network), network
@@ -0,0 +1,226 @@
+# Tests for the factory LP in solver: the LP file, CBC solution parsing and the backends
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import pyomo.environ as pyomo # type: ignore
+from gamelogic.electricity import Voltage, VoltageTier
+from gamelogic.game_time import GameTime
+from gamelogic.items import make_itemstack
+from gamelogic.machines import StandardOverclockMachineRecipe
+from models import ZERO_TOLERANCE, make_target
+from solver import LinearProblem, build_network, complete_solution, read_cbc_solution, route_flows, solve, solve_direct_lp, solve_highs
+
+def make_recipe(name: str, inputs: dict[str, float], outputs: dict[str, float], ticks: int = 100):
+    return StandardOverclockMachineRecipe(
+        name,
+        VoltageTier.LV,
+        [make_itemstack(item, quantity) for item, quantity in inputs.items()],
+        [make_itemstack(item, quantity) for item, quantity in outputs.items()],
+        GameTime.from_ticks(ticks),
+        Voltage(30),
+    )
+
+# ore -> furnace -> ingot, one ingot per 100 ticks per furnace
+CHAIN = [make_recipe('furnace', {'ore': 1}, {'ingot': 1})]
+CHAIN_TARGET = make_target('ingot', 0.5)
+
+# Steel from an EBF fed oxygen by an electrolyzer, whose hydrogen an LCR burns back into water
+STEEL = [
+    make_recipe('ebf', {'iron dust': 1, 'carbon dust': 1, 'oxygen': 1000}, {'steel ingot': 1}, 500),
+    make_recipe('electrolyzer', {'water': 500}, {'oxygen': 500, 'hydrogen': 1000}, 1000),
+    make_recipe('lcr', {'hydrogen': 2000, 'oxygen': 500}, {'water': 1000}, 20),
+    make_recipe('centrifuge', {'coal dust': 2}, {'carbon dust': 1, 'ash': 1}, 200),
+]
+STEEL_TARGET = make_target('steel ingot', 10)
+
+class TestBuildNetwork(unittest.TestCase):
+    def test_no_sink_for_raw_input(self):
+        # Test an item no machine makes gets a source but no sink
+        network = build_network(CHAIN, CHAIN_TARGET)
+        self.assertIn('SOURCE_ore', network.names)
+        self.assertNotIn('SINK_ore', network.names)
+        self.assertIn('SINK_ingot', network.names)
+
+    def test_sink_for_raw_input_target(self):
+        # Test a target item no machine makes still gets a sink, and the solve meets the target
+        target = make_target('ore', 0.3)
+        network = build_network(CHAIN, target)
+        self.assertIn('SINK_ore', network.names)
+
+        values, _, _ = solve(CHAIN, target)
+        self.assertGreaterEqual(values['SINK_ore'], 0.3 - ZERO_TOLERANCE)
+        self.assertAlmostEqual(values['SOURCE_ore'], -0.3)
+        self.assertAlmostEqual(values['M0'], 0)
+
+class TestLinearProblemWrite(unittest.TestCase):
+    def test_write(self):
+        # Test the exact LP file text for a small problem
+        problem = LinearProblem()
+        problem.objective = [(1.0, 0), (-1.0, 1)]
+        problem.add_eq([(1.0, 0), (-0.5, 1)])
+        problem.add_ge([(1.0, 1)], 2.0)
+        problem.add_le([(1.0, 2)])
+        problem.add_free(1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.lp')
+            problem.write(path)
+            with open(path) as lp_file:
+                text = lp_file.read()
+
+        self.assertEqual(text,
+            'minimize\n'
+            ' obj: + 1.0 x0 - 1.0 x1\n'
+            'subject to\n'
+            ' c0: + 1.0 x0 - 0.5 x1 = 0.0\n'
+            ' c1: + 1.0 x1 >= 2.0\n'
+            ' c2: + 1.0 x2 <= 0.0\n'
+            'bounds\n'
+            ' x1 free\n'
+            'end\n')
+
+class TestReadCbcSolution(unittest.TestCase):
+    def read(self, text: str) -> dict[str, float]:
+        network = build_network(CHAIN, CHAIN_TARGET)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.sol')
+            with open(path, 'w') as solution_file:
+                solution_file.write(text)
+            return read_cbc_solution(path, network)
+
+    def test_optimal(self):
+        # Test a CBC solution file, with a "**" row and the zero SOURCE_OUT/SINK_IN left out
+        values = self.read(
+            'Optimal - objective value 50.50000000\n'
+            '      0 x0                    50                       0\n'
+            '      1 x1                   0.5                       0\n'
+            '      2 x2                   0.5                       0\n'
+            '**    3 x3                  -0.5                       1\n'
+            '      5 x5                   0.5                       0\n')
+        self.assertEqual(values, {
+            'M0': 50.0,
+            'M0_IN_ore': 0.5,
+            'M0_OUT_ingot': 0.5,
+            'SOURCE_ore': -0.5,
+            'SOURCE_OUT_ore': 0.0,
+            'SINK_ingot': 0.5,
+            'SINK_IN_ingot': 0.0,
+        })
+
+    def test_not_optimal(self):
+        # Test that any other status is an error
+        with self.assertRaises(RuntimeError):
+            self.read('Infeasible - objective value 0.00000000\n')
+
+@unittest.skipUnless(shutil.which('cbc'), 'cbc is not installed')
+class TestSolveDirectLp(unittest.TestCase):
+    def test_matches_pyomo(self):
+        # Test that the LP file solved by CBC gives the same values as the Pyomo model
+        direct_values, _ = solve_direct_lp(CHAIN, CHAIN_TARGET)
+        pyomo_values, _, _ = solve(CHAIN, CHAIN_TARGET)
+        self.assertEqual(direct_values.keys(), pyomo_values.keys())
+        for name, value in pyomo_values.items():
+            self.assertAlmostEqual(direct_values[name], value, places=6)
+
+@unittest.skipIf(importlib.util.find_spec('highspy') is None, 'highspy is not installed')
+class TestSolveHighs(unittest.TestCase):
+    def test_matches_pyomo(self):
+        # Test that HiGHS gives the same machine, link, source, sink and tax values as the Pyomo model
+        highs_values, network = solve_highs(STEEL, STEEL_TARGET)
+        pyomo_values, _, _ = solve(STEEL, STEEL_TARGET)
+        for name in network.names:
+            self.assertAlmostEqual(highs_values[name], pyomo_values[name], places=6, msg=name)
+
+class TestSolve(unittest.TestCase):
+    def test_chain(self):
+        # Test machine counts and objective for ore -> furnace -> ingot -> press -> plate
+        # Plates at 0.1/tick need 5 presses (0.02/tick each), which need 0.2 ingots/tick
+        # from 20 furnaces (0.01/tick each), which need 0.2 ore/tick from the source
+        recipes = [
+            make_recipe('furnace', {'ore': 1}, {'ingot': 1}),
+            make_recipe('press', {'ingot': 2}, {'plate': 1}, 50),
+        ]
+        model = pyomo.ConcreteModel()
+        values, _, _ = solve(recipes, make_target('plate', 0.1), model=model)
+
+        self.assertAlmostEqual(values['M0'], 20)
+        self.assertAlmostEqual(values['M1'], 5)
+        self.assertAlmostEqual(values['SOURCE_ore'], -0.2)
+        self.assertAlmostEqual(values['SINK_plate'], 0.1)
+        self.assertAlmostEqual(values['M0_OUT_ingot_TO_M1_IN_ingot'], 0.2)
+        # 25 machines plus 0.2 ore/tick from the source
+        self.assertAlmostEqual(pyomo.value(model.objective), 25.2)
+
+    def test_catalyst_loop(self):
+        # Test a machine that consumes one of its own outputs feeds itself instead of a source
+        # 10 machines make 0.2 crop/tick, cycling 0.1 seed/tick and using 0.1 dirt/tick
+        recipes = [make_recipe('farm', {'seed': 1, 'dirt': 1}, {'seed': 1, 'crop': 2})]
+        model = pyomo.ConcreteModel()
+        values, _, _ = solve(recipes, make_target('crop', 0.2), model=model)
+
+        self.assertAlmostEqual(values['M0'], 10)
+        self.assertAlmostEqual(values['M0_OUT_seed_TO_M0_IN_seed'], 0.1)
+        self.assertAlmostEqual(values['SOURCE_seed'], 0)
+        self.assertAlmostEqual(values['SINK_seed'], 0)
+        self.assertAlmostEqual(values['SOURCE_dirt'], -0.1)
+        self.assertAlmostEqual(pyomo.value(model.objective), 10.1)
+
+class TestCompleteSolution(unittest.TestCase):
+    def test_substitutes(self):
+        # Test SOURCE_OUT and SINK_IN, which are left out of the LP, are filled in from their source and sink
+        network = build_network(CHAIN, CHAIN_TARGET)
+        solved = {network.names[variable]: 0.0 for variable in range(len(network.names)) if variable not in network.substitutes}
+        values = complete_solution(solved | {'SOURCE_ore': -0.5, 'SINK_ingot': 0.25}, network)
+
+        self.assertEqual(values['SOURCE_OUT_ore'], 0.5)
+        self.assertEqual(values['SOURCE_OUT_ore'], -values['SOURCE_ore'])
+        self.assertEqual(values['SINK_IN_ingot'], 0.25)
+        self.assertEqual(values['SINK_IN_ingot'], values['SINK_ingot'])
+
+class TestRouteFlows(unittest.TestCase):
+    def test_many_producers_and_consumers(self):
+        # Test splitting gas made by two machines and used by two machines, topped up from its source
+        recipes = [
+            make_recipe('a', {'x': 1}, {'gas': 1}),
+            make_recipe('b', {'y': 1}, {'gas': 1}),
+            make_recipe('c', {'gas': 1}, {'p': 1}),
+            make_recipe('d', {'gas': 1}, {'q': 1}),
+        ]
+        network = build_network(recipes, make_target('p', 1))
+        solved = {
+            'M0_OUT_gas': 3.0,
+            'M1_OUT_gas': 1.0,
+            'SOURCE_OUT_gas': 1.5 + ZERO_TOLERANCE / 2,
+            'M2_IN_gas': 4.0,
+            'M3_IN_gas': 1.5,
+            # Round-off left over for the sink
+            'SINK_IN_gas': ZERO_TOLERANCE / 2,
+        }
+        values = route_flows(dict.fromkeys(network.names, 0.0) | solved, network)
+        edges = {network.edge_meta[name].endpoints: flow for name, flow in values.items() if name not in network.names}
+
+        self.assertEqual(edges, {
+            ('M0_OUT_gas', 'M2_IN_gas'): 3.0,
+            ('M1_OUT_gas', 'M2_IN_gas'): 1.0,
+            ('SOURCE_OUT_gas', 'M3_IN_gas'): 1.5,
+        })
+        # Every link's edges add up to its solved value
+        for link, flow in solved.items():
+            routed = sum(edge_flow for endpoints, edge_flow in edges.items() if link in endpoints)
+            self.assertAlmostEqual(routed, flow, delta=ZERO_TOLERANCE, msg=link)
+
+    def test_edge_meta_replaced(self):
+        # Test routing again keeps only the new edges' metadata and never touches var_meta
+        network = build_network([make_recipe('furnace', {'ore': 1}, {'ingot': 1})], make_target('ingot', 1))
+        var_meta = dict(network.var_meta)
+        route_flows(dict.fromkeys(network.names, 0.0) | {'M0_IN_ore': 1.0, 'SOURCE_OUT_ore': 1.0}, network)
+        self.assertEqual(network.edge_meta.keys(), {'SOURCE_OUT_ore_TO_M0_IN_ore'})
+
+        route_flows(dict.fromkeys(network.names, 0.0) | {'M0_OUT_ingot': 1.0, 'SINK_IN_ingot': 1.0}, network)
+        self.assertEqual(network.edge_meta.keys(), {'M0_OUT_ingot_TO_SINK_IN_ingot'})
+        self.assertEqual(network.var_meta, var_meta)
+
+if __name__ == '__main__':
+    unittest.main()